@@ -2,8 +2,13 @@
 엑셀 파일 생성 모듈
 Upload_form.xlsx 형식의 전표 파일 생성
 """
-import io
+import colorsys
+import math
+import tempfile
+import xlsxwriter
+from functools import lru_cache
 from openpyxl import load_workbook
+from openpyxl.styles.colors import COLOR_INDEX
 
 
 # Unmatched 시트 헤더
@@ -17,87 +22,416 @@ UPLOAD_FORM_COLUMNS = [
     '차변계정코드', '차변금액', '대변계정코드', '대변금액', '메모', '프로젝트', '은행코드'
 ]
 
+# xlsxwriter 서식 변환용 테이블 (리스트 위치가 xlsxwriter의 인덱스)
+_BORDER_STYLES = [
+    None, "thin", "medium", "dashed", "dotted", "thick", "double", "hair",
+    "mediumDashed", "dashDot", "mediumDashDot", "dashDotDot", "mediumDashDotDot", "slantDashDot"
+]
+_FILL_PATTERNS = [
+    "none", "solid", "mediumGray", "darkGray", "lightGray", "darkHorizontal", "darkVertical",
+    "darkDown", "darkUp", "darkGrid", "darkTrellis", "lightHorizontal", "lightVertical",
+    "lightDown", "lightUp", "lightGrid", "lightTrellis", "gray125", "gray0625"
+]
+_H_ALIGN = {
+    "left": "left", "center": "center", "right": "right", "fill": "fill",
+    "justify": "justify", "centerContinuous": "center_across", "distributed": "distributed"
+}
+_V_ALIGN = {
+    "top": "top", "center": "vcenter", "bottom": "bottom",
+    "justify": "vjustify", "distributed": "vdistributed"
+}
+_UNDERLINES = {"single": 1, "double": 2, "singleAccounting": 33, "doubleAccounting": 34}
 
-def build_upload_form_workbook(matches, unmatched, template_path="Upload_form.xlsx"):
+# 생성된 엑셀 파일을 메모리에 유지할 최대 크기 (초과 시 임시 파일로 전환)
+OUTPUT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# 테마 색상 (openpyxl이 저장 시 넣는 기본 Office 테마, 스타일의 theme 인덱스 순서)
+_THEME_COLORS = [
+    "FFFFFF", "000000", "EEECE1", "1F497D", "4F81BD",
+    "C0504D", "9BBB59", "8064A2", "4BACC6", "F79646", "0000FF", "800080"
+]
+
+
+@lru_cache(maxsize=None)
+def _template_snapshot(template_path):
     """
-    매칭된 전표 데이터를 Upload_form.xlsx 형식으로 직접 생성
+    템플릿 워크북을 한 번만 읽어 복사에 필요한 내용을 일반 데이터로 저장
+    (요청 간에 공유되므로 openpyxl 객체를 보관하지 않음, 생성 시 읽기만 하고 수정하지 않음)
     
     Args:
-        matches (list): 매칭된 거래 데이터 리스트
-        unmatched (list): 매칭 실패한 거래 데이터 리스트
         template_path (str): Upload_form.xlsx 템플릿 파일 경로
         
     Returns:
-        io.BytesIO: Upload_form.xlsx 형식의 엑셀 파일 바이너리 데이터
+        dict: {"sheets": 시트별 내용 리스트, "styles": 스타일 ID -> xlsxwriter 서식 속성,
+               "active": 활성 시트 인덱스, "single_row_merges": 모든 병합 셀이 한 행 안에 있는지 여부}
     """
-    # Upload_form.xlsx 템플릿 로드 (서식 보존)
     template_wb = load_workbook(template_path)
-    template_ws = template_wb['일반전표']
+    styles = {}
+    sheets = [_snapshot_sheet(template_ws, styles) for template_ws in template_wb]
     
-    # 데이터 입력 시작 행 (12행이 헤더이므로 13행부터)
-    start_row = 13
+    return {
+        "sheets": sheets,
+        "styles": styles,
+        "active": template_wb.index(template_wb.active),
+        "single_row_merges": all(
+            merged[0] == merged[2]
+            for sheet in sheets for merges in sheet["merges"].values() for merged in merges
+        )
+    }
+
+
+def _snapshot_sheet(template_ws, styles):
+    """
+    템플릿 시트의 값, 서식, 메모, 병합 셀, 열 너비, 행 높이를 일반 데이터로 변환
     
-    # 매칭된 거래 데이터를 Upload_form 형식으로 변환하여 입력
-    sequence_number = 1
-    for row_idx, match_row in enumerate(matches, start=start_row):
-        # 전표구분: 입금=2, 출금=1
-        voucher_type = 2 if match_row["type"] == "입금" else 1
-        
-        # 금액 설정
-        amount = match_row["amount"]
-        
-        # 차변/대변 금액 설정
-        debit_amount = match_row["amount"] if match_row["type"] == "입금" else ""
-        credit_amount = match_row["amount"] if match_row["type"] == "출금" else ""
+    Args:
+        template_ws: openpyxl 템플릿 시트
+        styles (dict): 스타일 ID -> xlsxwriter 서식 속성 (사용된 서식을 추가)
         
-        # Upload_form 컬럼 순서에 맞춰 데이터 입력
-        row_data = [
-            sequence_number,              # 순번
-            match_row["date"],            # 거래일
-            voucher_type,                 # 전표구분
-            match_row["code"],            # 코드
-            match_row["name"],            # 거래처명
-            match_row["memo"],            # 적요
-            2,                            # 결제장부 (예금 고정)
-            amount,                       # 금액
-            "",                           # 차변계정코드
-            debit_amount,                 # 차변금액
-            "",                           # 대변계정코드
-            credit_amount,                # 대변금액
-            match_row["memo"],            # 메모
-            "",                           # 프로젝트
-            ""                            # 은행코드
+    Returns:
+        dict: {"title", "max_row", "columns", "rows", "merges"} 시트 내용
+    """
+    def style_key(cell):
+        if not cell.has_style:
+            return None
+        if cell.style_id not in styles:
+            styles[cell.style_id] = _xlsx_format_props(cell)
+        return cell.style_id
+    
+    columns = [
+        (dim.min, dim.max, dim.width, dim.hidden)
+        for dim in template_ws.column_dimensions.values()
+        if dim.min is not None and dim.max is not None
+    ]
+    
+    # 병합 영역은 왼쪽 위 셀의 값과 서식으로 시작 행에 기록
+    merges = {}
+    for merged_range in template_ws.merged_cells.ranges:
+        top_left = template_ws.cell(row=merged_range.min_row, column=merged_range.min_col)
+        merges.setdefault(merged_range.min_row, []).append((
+            merged_range.min_row, merged_range.min_col, merged_range.max_row, merged_range.max_col,
+            top_left.value, style_key(top_left)
+        ))
+    
+    rows = []
+    for row in template_ws.iter_rows():
+        row_idx = row[0].row
+        row_dim = template_ws.row_dimensions.get(row_idx)
+        height, hidden = (row_dim.height, row_dim.hidden) if row_dim is not None else (None, False)
+        cells = [
+            (cell.column, cell.value, style_key(cell),
+             (cell.comment.text, cell.comment.author, cell.comment.width, cell.comment.height)
+             if cell.comment is not None else None)
+            for cell in row
         ]
+        rows.append((row_idx, height, hidden, cells))
+    
+    return {
+        "title": template_ws.title,
+        "max_row": template_ws.max_row,
+        "columns": columns,
+        "rows": rows,
+        "merges": merges
+    }
+
+
+def _upload_form_row(sequence_number, match_row):
+    """
+    매칭된 거래 데이터 하나를 Upload_form 컬럼 순서의 행으로 변환
+    
+    Args:
+        sequence_number (int): 순번
+        match_row (dict): 매칭된 거래 데이터
         
-        # 각 셀에 값 입력 (서식 보존)
-        for col_idx, value in enumerate(row_data, start=1):
-            template_ws.cell(row=row_idx, column=col_idx, value=value)
+    Returns:
+        list: UPLOAD_FORM_COLUMNS 순서의 값 리스트
+    """
+    # 전표구분: 입금=2, 출금=1
+    voucher_type = 2 if match_row["type"] == "입금" else 1
+    
+    # 금액 설정
+    amount = match_row["amount"]
+    
+    # 차변/대변 금액 설정
+    debit_amount = match_row["amount"] if match_row["type"] == "입금" else ""
+    credit_amount = match_row["amount"] if match_row["type"] == "출금" else ""
+    
+    return [
+        sequence_number,              # 순번
+        match_row["date"],            # 거래일
+        voucher_type,                 # 전표구분
+        match_row["code"],            # 코드
+        match_row["name"],            # 거래처명
+        match_row["memo"],            # 적요
+        2,                            # 결제장부 (예금 고정)
+        amount,                       # 금액
+        "",                           # 차변계정코드
+        debit_amount,                 # 차변금액
+        "",                           # 대변계정코드
+        credit_amount,                # 대변금액
+        match_row["memo"],            # 메모
+        "",                           # 프로젝트
+        ""                            # 은행코드
+    ]
+
+
+def _xlsx_color(color):
+    """
+    openpyxl 색상을 xlsxwriter 색상 문자열로 변환
+    
+    Args:
+        color: openpyxl Color 객체
         
-        sequence_number += 1
+    Returns:
+        str: "#RRGGBB" 형식의 색상 또는 None (자동 색상 등 변환 불가)
+    """
+    if color is None:
+        return None
     
-    # Unmatched 시트가 있으면 데이터 추가, 없으면 생성
-    if "Unmatched" in template_wb.sheetnames:
-        ws_unmatched = template_wb["Unmatched"]
-        # 기존 데이터 삭제 (헤더 제외)
-        ws_unmatched.delete_rows(2, ws_unmatched.max_row)
+    if color.type == "rgb" and isinstance(color.rgb, str):
+        rgb = color.rgb[-6:]
+    elif color.type == "indexed" and color.indexed < len(COLOR_INDEX):
+        rgb = COLOR_INDEX[color.indexed][-6:]
+    elif color.type == "theme" and color.theme < len(_THEME_COLORS):
+        rgb = _THEME_COLORS[color.theme]
     else:
-        ws_unmatched = template_wb.create_sheet("Unmatched")
-        ws_unmatched.append(HEADERS_UNMATCHED)
-    
-    # 매칭 실패한 거래 데이터 추가
-    for unmatched_row in unmatched:
-        ws_unmatched.append([
-            unmatched_row["date"],           # 거래일자
-            unmatched_row["type"],           # 입출금구분
-            unmatched_row["amount"],         # 금액
-            unmatched_row["counter_raw"],    # 보낸분/받는분
-            unmatched_row["memo"],           # 메모
-            "매칭 실패"                      # 사유
+        return None
+    
+    # 밝기(tint) 적용 (Excel과 동일하게 HLS의 명도 조정)
+    if color.tint:
+        h, l, s = colorsys.rgb_to_hls(*(int(rgb[i:i + 2], 16) / 255 for i in (0, 2, 4)))
+        l = l * (1 + color.tint) if color.tint < 0 else l * (1 - color.tint) + color.tint
+        rgb = "".join(f"{round(v * 255):02X}" for v in colorsys.hls_to_rgb(h, l, s))
+    
+    return "#" + rgb
+
+
+def _xlsx_format_props(cell):
+    """
+    openpyxl 셀 서식을 xlsxwriter 서식 속성으로 변환
+    
+    Args:
+        cell: 서식이 있는 openpyxl 셀
+        
+    Returns:
+        dict: xlsxwriter add_format 속성
+    """
+    font, fill, alignment = cell.font, cell.fill, cell.alignment
+    rotation = alignment.text_rotation or 0
+    if rotation == 255:
+        rotation = 270  # 세로 쓰기
+    elif rotation > 90:
+        rotation = 90 - rotation
+    
+    props = {
+        "font_name": font.name,
+        "font_size": font.sz,
+        "bold": font.b,
+        "italic": font.i,
+        "underline": _UNDERLINES.get(font.u),
+        "font_strikeout": font.strike,
+        "font_script": {"superscript": 1, "subscript": 2}.get(font.vertAlign),
+        "font_color": _xlsx_color(font.color),
+        "font_charset": font.charset,
+        "font_family": int(font.family) if font.family else None,
+        "font_scheme": font.scheme,
+        "num_format": cell.number_format if cell.number_format != "General" else None,
+        "align": _H_ALIGN.get(alignment.horizontal),
+        "valign": _V_ALIGN.get(alignment.vertical),
+        "text_wrap": alignment.wrap_text,
+        "indent": int(alignment.indent or 0),
+        "shrink": alignment.shrink_to_fit,
+        "rotation": rotation,
+    }
+    
+    # 채우기 (solid 패턴은 xlsxwriter에서 bg_color가 셀 색상)
+    pattern = getattr(fill, "patternType", None)
+    if pattern in _FILL_PATTERNS[1:]:
+        props["pattern"] = _FILL_PATTERNS.index(pattern)
+        if pattern == "solid":
+            props["bg_color"] = _xlsx_color(fill.fgColor)
+        else:
+            props["fg_color"] = _xlsx_color(fill.fgColor)
+            props["bg_color"] = _xlsx_color(fill.bgColor)
+    
+    # 테두리
+    for side_name in ("left", "right", "top", "bottom"):
+        side = getattr(cell.border, side_name)
+        if side is not None and side.style in _BORDER_STYLES:
+            props[side_name] = _BORDER_STYLES.index(side.style)
+            props[side_name + "_color"] = _xlsx_color(side.color)
+    
+    return {key: value for key, value in props.items() if value not in (None, False, 0)}
+
+
+def _xlsx_format(workbook, formats, styles, style_key):
+    """
+    템플릿 서식에 해당하는 xlsxwriter 서식 (워크북마다 같은 서식은 한 번만 생성)
+    
+    Args:
+        workbook (xlsxwriter.Workbook): 출력 워크북
+        formats (dict): 스타일 ID -> xlsxwriter 서식 캐시
+        styles (dict): 스타일 ID -> xlsxwriter 서식 속성
+        style_key (int): 스타일 ID 또는 None (서식 없음)
+        
+    Returns:
+        xlsxwriter.format.Format: 변환된 서식 또는 None (서식 없음)
+    """
+    if style_key is None:
+        return None
+    
+    if style_key not in formats:
+        formats[style_key] = workbook.add_format(styles[style_key])
+    return formats[style_key]
+
+
+def _xlsx_value(value):
+    """xlsxwriter로 쓸 수 없는 값(NaN, 무한대)을 빈 셀로 변환"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _copy_comment(worksheet, row, col, comment):
+    """
+    템플릿 셀의 메모(작성자, 크기 포함)를 xlsxwriter 시트의 같은 셀에 복사
+    
+    Args:
+        worksheet (xlsxwriter.worksheet.Worksheet): 출력 시트
+        row (int): 행 번호 (0부터 시작)
+        col (int): 열 번호 (0부터 시작)
+        comment (tuple): (내용, 작성자, 너비, 높이)
+    """
+    text, author, width, height = comment
+    options = {"width": width, "height": height}
+    if author:
+        options["author"] = author
+    worksheet.write_comment(row, col, text, options)
+
+
+def _copy_template_sheet(workbook, worksheet, sheet, styles, formats, overrides=None, max_row=None):
+    """
+    템플릿 시트의 값, 서식, 메모, 병합 셀, 열 너비, 행 높이를 xlsxwriter 시트로 복사
+    (constant_memory 모드를 위해 행 순서대로 기록)
+    
+    Args:
+        workbook (xlsxwriter.Workbook): 출력 워크북
+        worksheet (xlsxwriter.worksheet.Worksheet): 출력 시트
+        sheet (dict): 템플릿 시트 내용 (_snapshot_sheet 결과)
+        styles (dict): 스타일 ID -> xlsxwriter 서식 속성
+        formats (dict): 스타일 ID -> xlsxwriter 서식 캐시
+        overrides (dict): 행 번호 -> 템플릿 값 대신 입력할 값 리스트 (템플릿 서식 유지)
+        max_row (int): 복사할 마지막 행 (기본값: 템플릿의 마지막 행)
+    """
+    overrides = overrides or {}
+    
+    # 열 너비 (xlsxwriter는 여백을 더해 저장하므로 템플릿에 저장된 값에서 여백을 뺌)
+    for min_col, max_col, width, hidden in sheet["columns"]:
+        width = width - 5 / 7 if width else None
+        worksheet.set_column(min_col - 1, max_col - 1, width, None, {"hidden": hidden})
+    
+    for row_idx, height, hidden, cells in sheet["rows"]:
+        if max_row is not None and row_idx > max_row:
+            break
+        if height or hidden:
+            worksheet.set_row(row_idx - 1, height, None, {"hidden": hidden})
+        
+        # 병합 영역을 먼저 만들고, 영역 안의 셀은 아래에서 각자의 서식으로 다시 기록
+        for min_row, min_col, merge_max_row, merge_max_col, value, style_key in sheet["merges"].get(row_idx, []):
+            worksheet.merge_range(
+                min_row - 1, min_col - 1, merge_max_row - 1, merge_max_col - 1,
+                _xlsx_value(value), _xlsx_format(workbook, formats, styles, style_key)
+            )
+        
+        override = overrides.get(row_idx)
+        for column, value, style_key, comment in cells:
+            if override is not None and column <= len(override):
+                value = override[column - 1]
+            if comment is not None:
+                _copy_comment(worksheet, row_idx - 1, column - 1, comment)
+            if value is None and style_key is None:
+                continue
+            worksheet.write(
+                row_idx - 1, column - 1, _xlsx_value(value),
+                _xlsx_format(workbook, formats, styles, style_key)
+            )
+
+
+def _write_unmatched_rows(worksheet, unmatched):
+    """
+    매칭 실패한 거래 데이터를 Unmatched 시트의 2행부터 입력
+    
+    Args:
+        worksheet (xlsxwriter.worksheet.Worksheet): Unmatched 시트
+        unmatched (list): 매칭 실패한 거래 데이터 리스트
+    """
+    for row_idx, unmatched_row in enumerate(unmatched, start=1):
+        worksheet.write_row(row_idx, 0, [
+            _xlsx_value(unmatched_row["date"]),    # 거래일자
+            unmatched_row["type"],                 # 입출금구분
+            _xlsx_value(unmatched_row["amount"]),  # 금액
+            unmatched_row["counter_raw"],          # 보낸분/받는분
+            unmatched_row["memo"],                 # 메모
+            "매칭 실패"                            # 사유
         ])
+
+
+def build_upload_form_workbook(matches, unmatched, template_path="Upload_form.xlsx"):
+    """
+    매칭된 전표 데이터를 Upload_form.xlsx 형식으로 생성
+    (템플릿의 값, 서식, 메모는 openpyxl로 읽어 xlsxwriter 워크북에 다시 적용)
     
-    # 바이너리 데이터로 변환
-    buffer = io.BytesIO()
-    template_wb.save(buffer)
-    buffer.seek(0)
+    Args:
+        matches (list): 매칭된 거래 데이터 리스트
+        unmatched (list): 매칭 실패한 거래 데이터 리스트
+        template_path (str): Upload_form.xlsx 템플릿 파일 경로
+        
+    Returns:
+        tempfile.SpooledTemporaryFile: Upload_form.xlsx 형식의 엑셀 파일 (처음 위치로 이동된 상태, 사용 후 close 필요)
+    """
+    template = _template_snapshot(template_path)
+    styles = template["styles"]
+    
+    # 데이터 입력 시작 행 (12행이 헤더이므로 13행부터)
+    start_row = 13
+    form_rows = {
+        start_row + i: _upload_form_row(i + 1, match_row)
+        for i, match_row in enumerate(matches)
+    }
     
-    return buffer
+    # 결과가 크면 메모리 대신 임시 파일에 기록
+    # (여러 행에 걸친 병합 셀이 있으면 행 순서대로만 기록할 수 없으므로 constant_memory 미사용)
+    output = tempfile.SpooledTemporaryFile(max_size=OUTPUT_SPOOL_MAX_SIZE)
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": template["single_row_merges"],
+        "strings_to_urls": False
+    })
+    formats = {}
+    
+    for sheet in template["sheets"]:
+        worksheet = workbook.add_worksheet(sheet["title"])
+        
+        if sheet["title"] == "일반전표":
+            # 템플릿에 서식이 지정된 행은 템플릿 서식으로, 나머지 행은 서식 없이 입력
+            _copy_template_sheet(workbook, worksheet, sheet, styles, formats, overrides=form_rows)
+            for row_idx in range(sheet["max_row"] + 1, start_row + len(matches)):
+                worksheet.write_row(row_idx - 1, 0, [_xlsx_value(v) for v in form_rows[row_idx]])
+        elif sheet["title"] == "Unmatched":
+            # 기존 Unmatched 시트는 헤더만 유지
+            _copy_template_sheet(workbook, worksheet, sheet, styles, formats, max_row=1)
+            _write_unmatched_rows(worksheet, unmatched)
+        else:
+            _copy_template_sheet(workbook, worksheet, sheet, styles, formats)
+    
+    # Unmatched 시트가 없으면 생성
+    if all(sheet["title"] != "Unmatched" for sheet in template["sheets"]):
+        worksheet = workbook.add_worksheet("Unmatched")
+        worksheet.write_row(0, 0, HEADERS_UNMATCHED)
+        _write_unmatched_rows(worksheet, unmatched)
+    
+    workbook.worksheets()[template["active"]].activate()
+    workbook.close()
+    output.seek(0)
+    
+    return output
+
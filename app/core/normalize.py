@@ -2,8 +2,13 @@
 이름 정규화 모듈
 ERP 거래처명과 은행 거래처명을 정확히 매칭하기 위한 정규화 함수
 """
+import numpy as np
 import regex as re
 import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein
 
 # 회사명 관련 키워드 제거용
 CORP_KEYWORDS = [
@@ -11,11 +16,76 @@ CORP_KEYWORDS = [
     "co.,ltd", "co.", "co", "inc", "ltd", "llc", "company"
 ]
 
+# 정규화용 정규식 (모듈 로드 시 한 번만 컴파일)
+# 회사명 키워드는 긴 것부터 매칭되도록 정렬 (예: "co.,ltd"가 "co"보다 먼저)
+_PAT_CORP = re.compile('|'.join(map(re.escape, sorted(CORP_KEYWORDS, key=len, reverse=True))))
+_PAT_STRIP = re.compile(r'\([^)]*\)|[-/_\d]+')  # 괄호 및 내용, 하이픈/슬래시/언더스코어, 숫자
+_PAT_NON_LETTER = re.compile(r'[^\p{L}]+')  # 한글, 영문 외 문자
+_PAT_BRACKET = re.compile(r'\(([^)]+)\)')  # 괄호 안의 내용
+
 # 한글 자모 분해용 상수
 KOREAN_FIRST = ord('ㄱ')  # 초성 시작
 KOREAN_MIDDLE = ord('ㅏ')  # 중성 시작
 KOREAN_LAST = ord('ㄱ')  # 종성 시작 (초성과 동일)
 KOREAN_COMPLETE = ord('가')  # 완성형 한글 시작
+KOREAN_SYLLABLE_COUNT = 11172  # 완성형 한글 글자 수 (가~힣)
+
+# 일괄 매칭 시 한 번에 계산할 유사도 행렬의 최대 행 수 (메모리 사용량 제한)
+MATCH_CHUNK_SIZE = 1024
+
+# RapidFuzz score_cutoff 여유값 (내부 편집거리 변환 시 부동소수 오차로 임계값과 같은 점수가 누락되지 않도록)
+SCORE_CUTOFF_MARGIN = 1e-6
+
+@dataclass
+class ErpCandidates:
+    """
+    ERP 거래처 후보 목록 (같은 인덱스끼리 한 거래처를 이루는 병렬 리스트)
+    
+    Attributes:
+        norm_names (list): 정규화된 거래처명 리스트
+        raw_names (list): 원본 거래처명 리스트
+        codes (list): 거래처 코드 리스트
+        norm_to_idx (dict): 정규화된 거래처명 -> 인덱스 (완전일치 조회용)
+    """
+    norm_names: list = field(default_factory=list)
+    raw_names: list = field(default_factory=list)
+    codes: list = field(default_factory=list)
+    norm_to_idx: dict = field(default_factory=dict)
+    
+    def __len__(self) -> int:
+        return len(self.norm_names)
+    
+    def add(self, norm: str, name: str, code: str):
+        """
+        거래처 추가 (같은 정규화 이름이 이미 있으면 위치는 유지하고 코드/이름만 갱신)
+        
+        Args:
+            norm (str): 정규화된 거래처명
+            name (str): 원본 거래처명
+            code (str): 거래처 코드
+        """
+        idx = self.norm_to_idx.get(norm)
+        if idx is None:
+            self.norm_to_idx[norm] = len(self.norm_names)
+            self.norm_names.append(norm)
+            self.raw_names.append(name)
+            self.codes.append(code)
+        else:
+            self.raw_names[idx] = name
+            self.codes[idx] = code
+    
+    def info(self, idx: int) -> dict:
+        """
+        인덱스에 해당하는 거래처 정보
+        
+        Args:
+            idx (int): 후보 인덱스
+            
+        Returns:
+            dict: {"code": 코드, "name": 거래처명}
+        """
+        return {"code": self.codes[idx], "name": self.raw_names[idx]}
+
 
 def normalize_name(s: str) -> str:
     """
@@ -30,6 +100,12 @@ def normalize_name(s: str) -> str:
     if not isinstance(s, str):
         return ""
     
+    return _normalize_name(s)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_name(s: str) -> str:
+    """normalize_name의 캐시된 구현 (같은 거래처명이 반복되므로 결과 재사용)"""
     # Unicode 정규화 (NFKC)
     s = unicodedata.normalize("NFKC", s)
     
@@ -37,20 +113,13 @@ def normalize_name(s: str) -> str:
     s = s.strip().lower()
     
     # 회사명 키워드 제거
-    for keyword in CORP_KEYWORDS:
-        s = s.replace(keyword, "")
-    
-    # 괄호 및 그 안의 내용 제거 (예: "(H", "(주)" 등)
-    s = re.sub(r'\([^)]*\)', '', s)
+    s = _PAT_CORP.sub('', s)
     
-    # 하이픈, 슬래시, 언더스코어 제거
-    s = re.sub(r'[-/_]', '', s)
-    
-    # 숫자 제거 (회사명에서 불필요한 숫자)
-    s = re.sub(r'\d+', '', s)
+    # 괄호 및 그 안의 내용(예: "(H", "(주)" 등), 하이픈/슬래시/언더스코어, 숫자를 한 번에 제거
+    s = _PAT_STRIP.sub('', s)
     
     # 특수문자 및 공백 제거 (한글, 영문만 유지)
-    s = re.sub(r'[^\p{L}]+', '', s)
+    s = _PAT_NON_LETTER.sub('', s)
     
     return s
 
@@ -68,12 +137,39 @@ def extract_bracket_contents(s: str) -> list:
     if not isinstance(s, str):
         return []
     
-    import re
     # 괄호 안의 내용 추출 (중첩된 괄호는 고려하지 않음)
-    matches = re.findall(r'\(([^)]+)\)', s)
+    matches = _PAT_BRACKET.findall(s)
     return [match.strip() for match in matches if match.strip()]
 
 
+def _build_jamo_table() -> np.ndarray:
+    """
+    완성형 한글 11172자의 (초성, 중성, 종성) 코드포인트 표 생성 (종성이 없으면 0)
+    
+    Returns:
+        numpy.ndarray: (11172 x 3) 코드포인트 배열
+    """
+    base = np.arange(KOREAN_SYLLABLE_COUNT, dtype=np.uint32)
+    table = np.empty((KOREAN_SYLLABLE_COUNT, 3), dtype=np.uint32)
+    table[:, 0] = KOREAN_FIRST + base // (21 * 28)
+    table[:, 1] = KOREAN_MIDDLE + (base % (21 * 28)) // 28
+    table[:, 2] = np.where(base % 28 > 0, KOREAN_FIRST + base % 28, 0)
+    return table
+
+
+# 완성형 한글 분해표 (모듈 로드 시 한 번만 계산)
+_JAMO_TABLE = _build_jamo_table()
+_JAMO_TUPLES = [
+    tuple(chr(code) if code else '' for code in row)
+    for row in _JAMO_TABLE.tolist()
+]
+# get_jamo_sequence용 str.translate 표 (완성형 한글 -> 자모 문자열)
+_JAMO_TRANSLATION = {
+    KOREAN_COMPLETE + idx: "".join(jamo)
+    for idx, jamo in enumerate(_JAMO_TUPLES)
+}
+
+
 def decompose_korean(char):
     """
     한글 문자를 초성, 중성, 종성으로 분해
@@ -89,20 +185,9 @@ def decompose_korean(char):
     
     code = ord(char)
     
-    # 완성형 한글 범위 확인
-    if KOREAN_COMPLETE <= code < KOREAN_COMPLETE + 11172:  # 가~힣
-        # 유니코드 한글 분해 공식
-        base = code - KOREAN_COMPLETE
-        first = base // (21 * 28)
-        middle = (base % (21 * 28)) // 28
-        last = base % 28
-        
-        # 초성, 중성, 종성으로 변환
-        first_char = chr(KOREAN_FIRST + first)
-        middle_char = chr(KOREAN_MIDDLE + middle)
-        last_char = chr(KOREAN_FIRST + last) if last > 0 else ''
-        
-        return (first_char, middle_char, last_char)
+    # 완성형 한글 범위 확인 (미리 계산한 분해표에서 조회)
+    if KOREAN_COMPLETE <= code < KOREAN_COMPLETE + KOREAN_SYLLABLE_COUNT:  # 가~힣
+        return _JAMO_TUPLES[code - KOREAN_COMPLETE]
     
     # 자모만 있는 경우
     elif KOREAN_FIRST <= code < KOREAN_FIRST + 30:  # ㄱ~ㅎ
@@ -113,6 +198,22 @@ def decompose_korean(char):
     return None
 
 
+@lru_cache(maxsize=8192)
+def get_jamo_sequence(text: str) -> str:
+    """
+    문자열을 자모 단위로 분해한 문자열 생성
+    (후보 이름이 대상마다 반복 분해되므로 결과를 캐시)
+    
+    Args:
+        text (str): 원본 문자열
+        
+    Returns:
+        str: 자모 시퀀스 (한글이 아닌 문자는 그대로 유지)
+    """
+    # 완성형 한글만 자모 문자열로 치환 (자모 및 한글이 아닌 문자는 그대로)
+    return text.translate(_JAMO_TRANSLATION)
+
+
 def korean_similarity(s1: str, s2: str) -> float:
     """
     한글 문자열 간의 유사도를 계산
@@ -134,30 +235,8 @@ def korean_similarity(s1: str, s2: str) -> float:
     if s1 == s2:
         return 1.0
     
-    # 자모 분해
-    def get_jamo_sequence(text):
-        sequence = []
-        for char in text:
-            decomposed = decompose_korean(char)
-            if decomposed:
-                sequence.extend([c for c in decomposed if c])
-            else:
-                sequence.append(char)  # 한글이 아닌 문자는 그대로
-        return sequence
-    
-    jamo1 = get_jamo_sequence(s1)
-    jamo2 = get_jamo_sequence(s2)
-    
-    # 자모 시퀀스 간 Levenshtein Distance 계산
-    distance = levenshtein_distance_jamo(jamo1, jamo2)
-    max_length = max(len(jamo1), len(jamo2))
-    
-    if max_length == 0:
-        return 1.0
-    
-    # 유사도 계산
-    similarity = 1.0 - (distance / max_length)
-    return max(0.0, similarity)
+    # 자모 시퀀스 간 Levenshtein 유사도 계산 (1 - 편집거리 / 최대길이)
+    return Levenshtein.normalized_similarity(get_jamo_sequence(s1), get_jamo_sequence(s2))
 
 
 def levenshtein_distance_jamo(seq1: list, seq2: list) -> int:
@@ -171,23 +250,7 @@ def levenshtein_distance_jamo(seq1: list, seq2: list) -> int:
     Returns:
         int: 편집 거리
     """
-    if len(seq1) < len(seq2):
-        return levenshtein_distance_jamo(seq2, seq1)
-    
-    if len(seq2) == 0:
-        return len(seq1)
-    
-    previous_row = list(range(len(seq2) + 1))
-    for i, c1 in enumerate(seq1):
-        current_row = [i + 1]
-        for j, c2 in enumerate(seq2):
-            insertions = previous_row[j + 1] + 1
-            deletions = current_row[j] + 1
-            substitutions = previous_row[j] + (c1 != c2)
-            current_row.append(min(insertions, deletions, substitutions))
-        previous_row = current_row
-    
-    return previous_row[-1]
+    return Levenshtein.distance(seq1, seq2)
 
 
 def levenshtein_distance(s1: str, s2: str) -> int:
@@ -201,23 +264,7 @@ def levenshtein_distance(s1: str, s2: str) -> int:
     Returns:
         int: 편집 거리
     """
-    if len(s1) < len(s2):
-        return levenshtein_distance(s2, s1)
-
-    if len(s2) == 0:
-        return len(s1)
-
-    previous_row = list(range(len(s2) + 1))
-    for i, c1 in enumerate(s1):
-        current_row = [i + 1]
-        for j, c2 in enumerate(s2):
-            insertions = previous_row[j + 1] + 1
-            deletions = current_row[j] + 1
-            substitutions = previous_row[j] + (c1 != c2)
-            current_row.append(min(insertions, deletions, substitutions))
-        previous_row = current_row
-    
-    return previous_row[-1]
+    return Levenshtein.distance(s1, s2)
 
 
 def calculate_similarity(s1: str, s2: str) -> float:
@@ -238,9 +285,20 @@ def calculate_similarity(s1: str, s2: str) -> float:
         return 0.0
     
     # 정규화된 문자열로 유사도 계산
-    norm1 = normalize_name(s1)
-    norm2 = normalize_name(s2)
+    return _normalized_similarity(normalize_name(s1), normalize_name(s2))
+
+
+def _normalized_similarity(norm1: str, norm2: str) -> float:
+    """
+    정규화된 두 문자열 간의 유사도를 계산 (한글 유사도 우선 적용)
     
+    Args:
+        norm1 (str): 정규화된 첫 번째 문자열
+        norm2 (str): 정규화된 두 번째 문자열
+        
+    Returns:
+        float: 유사도 (0.0 ~ 1.0)
+    """
     if not norm1 and not norm2:
         return 1.0
     
@@ -254,75 +312,170 @@ def calculate_similarity(s1: str, s2: str) -> float:
     # 한글 유사도 계산 (자모 분해 기반)
     korean_sim = korean_similarity(norm1, norm2)
     
-    # 기존 Levenshtein Distance 계산 (백업용)
-    distance = levenshtein_distance(norm1, norm2)
-    max_length = max(len(norm1), len(norm2))
-    basic_sim = 1.0 - (distance / max_length) if max_length > 0 else 0.0
+    # 기존 Levenshtein 유사도 계산 (백업용)
+    basic_sim = Levenshtein.normalized_similarity(norm1, norm2)
     
     # 한글 유사도가 더 높으면 한글 유사도 사용, 아니면 기본 유사도 사용
     return max(korean_sim, basic_sim)
 
 
-def smart_matching(target: str, candidates: dict, threshold: float = 0.80) -> tuple:
+def smart_matching(target: str, candidates: ErpCandidates, threshold: float = 0.80) -> tuple:
     """
     단계별 스마트 매칭 (다양한 케이스 커버)
+    1단계: 정규화 후 완전일치 (유사도 1.0)
+    2단계: 괄호 내용 완전일치 (0.95) 또는 괄호 내용과 임계값 이상인 첫 번째 후보
+    3단계: 괄호를 제거한 전체 문자열 완전일치 (0.9)
+    4단계: 임계값 이상 중 가장 높은 유사도의 후보 (동점이면 먼저 나온 후보)
+    
+    매칭 로직은 batch_matching 한 곳에만 두고 대상 하나로 호출
     
     Args:
         target (str): 매칭할 대상 문자열
-        candidates (dict): 후보 딕셔너리 {normalized_name: {"code": ..., "name": ...}}
+        candidates (ErpCandidates): ERP 거래처 후보 목록
         threshold (float): 유사도 임계값
         
     Returns:
         tuple: (매칭된 정보, 유사도) 또는 (None, 0.0)
     """
-    if not target or not candidates:
-        return None, 0.0
+    return batch_matching([target], candidates, threshold)[0]
+
+
+def _similarity_blocks(query_norms: list, choice_norms: list, choice_jamos: list, threshold: float):
+    """
+    정규화된 대상들과 후보들 간의 유사도 행렬을 블록 단위로 계산
+    (calculate_similarity와 동일하게 기본 유사도와 한글 유사도 중 큰 값 사용)
     
-    # 1단계: 완전일치 확인 (정규화 후)
-    normalized_target = normalize_name(target)
-    if normalized_target in candidates:
-        return candidates[normalized_target], 1.0
+    임계값보다 충분히 낮은 점수는 0으로 계산되며, 길이 차이만으로 임계값에 도달할 수 없는
+    쌍은 RapidFuzz 내부에서 편집거리 계산 없이 생략됨
     
-    # 2단계: 괄호 내용 추출 및 매칭
-    bracket_contents = extract_bracket_contents(target)
-    for content in bracket_contents:
-        content_normalized = normalize_name(content)
-        if content_normalized in candidates:
-            return candidates[content_normalized], 0.95  # 높은 유사도
+    Args:
+        query_norms (list): 정규화된 대상 문자열 리스트
+        choice_norms (list): 정규화된 후보 문자열 리스트
+        choice_jamos (list): 후보의 자모 시퀀스 리스트
+        threshold (float): 유사도 임계값
         
-        # 괄호 내용과 유사도 매칭
-        for normalized_name, candidate_info in candidates.items():
-            similarity = calculate_similarity(content, candidate_info["name"])
-            if similarity >= threshold:
-                return candidate_info, similarity
-    
-    # 3단계: 괄호를 제거한 전체 문자열 매칭
-    target_without_brackets = target.replace('(', '').replace(')', '')
-    target_no_brackets_normalized = normalize_name(target_without_brackets)
-    if target_no_brackets_normalized in candidates:
-        return candidates[target_no_brackets_normalized], 0.9  # 높은 유사도
-    
-    # 4단계: 기본 유사도 매칭
-    best_match = None
-    best_similarity = 0.0
-    
-    for normalized_name, candidate_info in candidates.items():
-        similarity = calculate_similarity(target, candidate_info["name"])
+    Yields:
+        numpy.ndarray: (블록 행 수 x 후보 수) 유사도 행렬
+    """
+    score_cutoff = max(0.0, threshold - SCORE_CUTOFF_MARGIN)
+    for start in range(0, len(query_norms), MATCH_CHUNK_SIZE):
+        block = query_norms[start:start + MATCH_CHUNK_SIZE]
+        basic_sim = process.cdist(
+            block, choice_norms,
+            scorer=Levenshtein.normalized_similarity,
+            dtype=np.float64, workers=-1, score_cutoff=score_cutoff
+        )
+        korean_sim = process.cdist(
+            [get_jamo_sequence(q) for q in block], choice_jamos,
+            scorer=Levenshtein.normalized_similarity,
+            dtype=np.float64, workers=-1, score_cutoff=score_cutoff
+        )
+        yield np.maximum(basic_sim, korean_sim)
+
+
+def batch_matching(targets: list, candidates: ErpCandidates, threshold: float = 0.80) -> list:
+    """
+    여러 대상 문자열을 한 번에 스마트 매칭 (smart_matching의 1~4단계 적용)
+    같은 거래처명은 한 번만 매칭하고, 유사도 계산은 대상 x 후보 행렬로 일괄 처리
+    
+    Args:
+        targets (list): 매칭할 대상 문자열 리스트
+        candidates (ErpCandidates): ERP 거래처 후보 목록
+        threshold (float): 유사도 임계값
         
-        if similarity >= threshold and similarity > best_similarity:
-            best_match = candidate_info
-            best_similarity = similarity
+    Returns:
+        list: 대상별 (매칭된 정보, 유사도) 튜플 리스트
+    """
+    # 은행 거래내역에는 같은 거래처가 반복되므로 고유한 거래처명만 매칭 (순서 유지)
+    unique_targets = list(dict.fromkeys(targets))
+    if len(unique_targets) == len(targets):
+        return _batch_matching_unique(targets, candidates, threshold)
     
-    return best_match, best_similarity
+    unique_results = dict(zip(unique_targets, _batch_matching_unique(unique_targets, candidates, threshold)))
+    return [unique_results[target] for target in targets]
+
+
+def _batch_matching_unique(targets: list, candidates: ErpCandidates, threshold: float) -> list:
+    """
+    중복 없는 대상 문자열 리스트에 대한 batch_matching 구현
+    
+    Args:
+        targets (list): 매칭할 대상 문자열 리스트 (중복 없음)
+        candidates (ErpCandidates): ERP 거래처 후보 목록
+        threshold (float): 유사도 임계값
+        
+    Returns:
+        list: 대상별 (매칭된 정보, 유사도) 튜플 리스트
+    """
+    results = [(None, 0.0)] * len(targets)
+    if not candidates:
+        return results
+    
+    norm_to_idx = candidates.norm_to_idx
+    choice_norms = candidates.norm_names
+    choice_jamos = [get_jamo_sequence(norm) for norm in choice_norms]
+    
+    # 1단계: 완전일치 확인, 나머지는 괄호 내용 매칭 대상으로 수집
+    pending = []
+    bracket_norms = []
+    for i, target in enumerate(targets):
+        if not target:
+            continue
+        normalized_target = normalize_name(target)
+        if normalized_target in norm_to_idx:
+            results[i] = (candidates.info(norm_to_idx[normalized_target]), 1.0)
+            continue
+        contents = [normalize_name(content) for content in extract_bracket_contents(target)]
+        pending.append((i, target, len(bracket_norms), contents))
+        bracket_norms.extend(contents)
+    
+    # 2단계: 괄호 내용별 첫 번째 임계값 이상 후보 (후보 순서 기준)
+    first_hits = []
+    for block in _similarity_blocks(bracket_norms, choice_norms, choice_jamos, threshold):
+        mask = block >= threshold
+        first_idx = mask.argmax(axis=1)
+        for row, idx in enumerate(first_idx):
+            first_hits.append((idx, block[row, idx]) if mask[row, idx] else None)
+    
+    fallback = []
+    for i, target, offset, contents in pending:
+        for k, content_normalized in enumerate(contents):
+            if content_normalized in norm_to_idx:
+                results[i] = (candidates.info(norm_to_idx[content_normalized]), 0.95)  # 높은 유사도
+                break
+            hit = first_hits[offset + k]
+            if hit is not None:
+                results[i] = (candidates.info(hit[0]), float(hit[1]))
+                break
+        else:
+            # 3단계: 괄호를 제거한 전체 문자열 매칭
+            target_without_brackets = target.replace('(', '').replace(')', '')
+            target_no_brackets_normalized = normalize_name(target_without_brackets)
+            if target_no_brackets_normalized in norm_to_idx:
+                results[i] = (candidates.info(norm_to_idx[target_no_brackets_normalized]), 0.9)  # 높은 유사도
+            else:
+                fallback.append(i)
+    
+    # 4단계: 기본 유사도 매칭 (가장 높은 유사도, 동점이면 먼저 나온 후보)
+    fallback_norms = [normalize_name(targets[i]) for i in fallback]
+    row_iter = iter(fallback)
+    for block in _similarity_blocks(fallback_norms, choice_norms, choice_jamos, threshold):
+        best_idx = block.argmax(axis=1)
+        for row, idx in enumerate(best_idx):
+            i = next(row_iter)
+            if block[row, idx] >= threshold:
+                results[i] = (candidates.info(idx), float(block[row, idx]))
+    
+    return results
 
 
-def find_best_match(target: str, candidates: dict, threshold: float = 0.80) -> tuple:
+def find_best_match(target: str, candidates: ErpCandidates, threshold: float = 0.80) -> tuple:
     """
     대상 문자열과 가장 유사한 후보를 찾아서 반환 (스마트 매칭 사용)
     
     Args:
         target (str): 매칭할 대상 문자열
-        candidates (dict): 후보 딕셔너리 {normalized_name: {"code": ..., "name": ...}}
+        candidates (ErpCandidates): ERP 거래처 후보 목록
         threshold (float): 유사도 임계값 (기본값: 0.80)
         
     Returns:
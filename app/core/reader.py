@@ -2,25 +2,33 @@
 파일 읽기 모듈
 ERP 미수미지급금 파일과 은행 거래내역 파일을 읽고 파싱
 """
+import numpy as np
 import pandas as pd
-from .normalize import normalize_name
+from .normalize import ErpCandidates, normalize_name
+
+# Rust 기반 calamine 엔진이 설치되어 있으면 Excel 읽기에 사용 (없으면 pandas 기본 엔진)
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = None
 
 
 def read_erp(path_or_file):
     """
-    ERP 미수미지급금 파일을 읽어서 거래처 매핑 딕셔너리 생성
+    ERP 미수미지급금 파일을 읽어서 거래처 후보 목록 생성
     
     Args:
         path_or_file: 파일 경로 또는 파일 객체
         
     Returns:
-        dict: 정규화된 거래처명 -> {"code": 코드, "name": 거래처명} 매핑
+        ErpCandidates: 정규화된 거래처명/원본 거래처명/코드 병렬 리스트와 정규화된 거래처명 -> 인덱스 매핑
         
     Raises:
         ValueError: 헤더를 찾을 수 없거나 필수 컬럼이 없는 경우
     """
-    # 먼저 헤더 행을 찾기 위해 데이터 타입을 문자열로 읽음
-    df = pd.read_excel(path_or_file, header=None, dtype=str)
+    # 헤더 행을 찾기 위해 헤더 없이 문자열로 한 번만 읽음
+    df = pd.read_excel(path_or_file, header=None, dtype=str, engine=EXCEL_ENGINE)
     
     # 첫 30행 내에서 "코드"와 "거래처"가 포함된 행 찾기
     header_idx = None
@@ -33,9 +41,10 @@ def read_erp(path_or_file):
     if header_idx is None:
         raise ValueError("ERP 헤더(코드/거래처명) 행을 찾지 못했습니다.")
     
-    # 헤더 행을 기준으로 데이터 읽기
-    df = pd.read_excel(path_or_file, header=header_idx, dtype=str)
-    df.columns = df.columns.astype(str)  # 컬럼명을 문자열로 변환
+    # 헤더 행을 컬럼명으로 사용하고 그 아래 행만 데이터로 사용 (파일을 다시 읽지 않음)
+    df.columns = df.iloc[header_idx].astype(str)  # 컬럼명을 문자열로 변환
+    df = df.iloc[header_idx + 1:].reset_index(drop=True)
+    df = df.loc[:, ~df.columns.duplicated()]  # 중복 컬럼명은 첫 번째 컬럼 사용
     
     # 필수 컬럼 확인
     if not {"코드", "거래처명"}.issubset(df.columns):
@@ -44,17 +53,14 @@ def read_erp(path_or_file):
     # 필요한 컬럼만 선택하고 빈 행 제거
     df = df[["코드", "거래처명"]].dropna()
     
-    # 정규화된 거래처명으로 매핑 딕셔너리 생성
-    mapping = {}
-    for _, row in df.iterrows():
-        normalized_name = normalize_name(row["거래처명"])
+    # 정규화된 거래처명 기준으로 후보 목록 생성 (같은 이름은 마지막 행의 코드/이름 사용)
+    candidates = ErpCandidates()
+    for code, name in zip(df["코드"], df["거래처명"]):
+        normalized_name = normalize_name(name)
         if normalized_name:
-            mapping[normalized_name] = {
-                "code": str(row["코드"]).strip(),
-                "name": str(row["거래처명"]).strip()
-            }
+            candidates.add(normalized_name, str(name).strip(), str(code).strip())
     
-    return mapping
+    return candidates
 
 
 def read_bank(path_or_file):
@@ -78,8 +84,8 @@ def read_bank(path_or_file):
             # CSV 파일의 경우 헤더가 6행(0-based index 6)에 있다고 가정
             return pd.read_csv(path_or_file, header=6, dtype=str)
         else:
-            # Excel 파일의 경우 헤더가 6행(0-based index 6)에 있다고 가정
-            return pd.read_excel(path_or_file, header=6, dtype=str)
+            # Excel 파일의 경우 헤더가 6행(0-based index 6)에 있다고 가정 (calamine 설치 시 사용)
+            return pd.read_excel(path_or_file, header=6, dtype=str, engine=EXCEL_ENGINE)
     
     df = _read_file()
     df.columns = df.columns.astype(str).str.strip()  # 컬럼명 정리
@@ -109,29 +115,17 @@ def read_bank(path_or_file):
                         .str.replace(" ", ""))
     df["출금액(원)"] = pd.to_numeric(df["출금액(원)"], errors="coerce").fillna(0)
     
+    # 입금액과 출금액 중 0이 아닌 것으로 거래 유형과 금액 결정 (입금 우선)
+    is_deposit = df["입금액(원)"] > 0
+    is_withdrawal = df["출금액(원)"] > 0
+    df["type"] = np.where(is_deposit, "입금", np.where(is_withdrawal, "출금", ""))
+    df["amount"] = df["입금액(원)"].where(is_deposit, df["출금액(원)"]).astype(float)
+    
+    # 입금액과 출금액이 모두 0인 경우 제외
+    df = df[df["type"] != ""]
+    
     # 거래 데이터 리스트 생성
-    rows = []
-    for _, row in df.iterrows():
-        # 입금액과 출금액 중 0이 아닌 것으로 거래 구분
-        deposit_amount = float(row["입금액(원)"]) if pd.notna(row["입금액(원)"]) else 0
-        withdrawal_amount = float(row["출금액(원)"]) if pd.notna(row["출금액(원)"]) else 0
-        
-        # 거래 유형과 금액 결정
-        if deposit_amount > 0:
-            transaction_type = "입금"
-            amount = deposit_amount
-        elif withdrawal_amount > 0:
-            transaction_type = "출금"
-            amount = withdrawal_amount
-        else:
-            continue  # 입금액과 출금액이 모두 0인 경우 건너뛰기
-        
-        rows.append({
-            "date": row["거래일시"],
-            "amount": amount,
-            "type": transaction_type,
-            "counter_raw": str(row["보낸분/받는분"]),
-            "memo": str(row["적요"]) if "적요" in row else ""
-        })
-    
-    return rows
+    df = df.rename(columns={"거래일시": "date", "보낸분/받는분": "counter_raw", "적요": "memo"})
+    df = df.assign(counter_raw=df["counter_raw"].map(str), memo=df["memo"].map(str))
+    
+    return df[["date", "amount", "type", "counter_raw", "memo"]].to_dict("records")
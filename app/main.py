@@ -2,14 +2,20 @@
 FastAPI 애플리케이션
 미수미지급금 대조 API 서버
 """
+import io
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from app.core.reader import read_erp, read_bank
-from app.core.normalize import find_best_match
+from app.core.normalize import batch_matching
 from app.core.generator import build_upload_form_workbook
 
+# 응답 스트리밍 시 한 번에 읽어 보낼 크기
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
 app = FastAPI(
     title="미수미지급금 대조 시스템",
     description="ERP 미수미지급금과 은행 거래내역을 대조하여 전표를 생성하는 API",
@@ -20,6 +26,26 @@ app = FastAPI(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
+async def _iter_file_chunks(file):
+    """
+    파일을 청크 단위로 읽어 스트리밍하고 전송이 끝나면 파일을 닫음
+    
+    Args:
+        file: 읽을 파일 객체
+        
+    Yields:
+        bytes: 최대 RESPONSE_CHUNK_SIZE 크기의 파일 내용
+    """
+    try:
+        while True:
+            chunk = await run_in_threadpool(file.read, RESPONSE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
 @app.post("/reconcile")
 async def reconcile(erp: UploadFile = File(...), bank: UploadFile = File(...)):
     """
@@ -37,7 +63,7 @@ async def reconcile(erp: UploadFile = File(...), bank: UploadFile = File(...)):
     """
     try:
         # ERP 파일 읽기
-        erp_mapping = read_erp(erp.file)
+        erp_candidates = read_erp(erp.file)
         
         # 은행 파일 읽기
         bank_rows = read_bank(bank.file)
@@ -55,14 +81,16 @@ async def reconcile(erp: UploadFile = File(...), bank: UploadFile = File(...)):
     matches = []
     unmatched = []
     
-    for bank_row in bank_rows:
-        # 유사도 기반 매칭 (80% 이상 임계값)
-        partner_info, similarity = find_best_match(
-            bank_row["counter_raw"], 
-            erp_mapping, 
-            threshold=0.80
-        )
-        
+    # 유사도 기반 일괄 매칭 (80% 이상 임계값)
+    # CPU 연산은 스레드풀에서 실행하여 이벤트 루프를 막지 않음 (cdist는 GIL을 해제하고 내부 병렬 처리)
+    match_results = await run_in_threadpool(
+        batch_matching,
+        [bank_row["counter_raw"] for bank_row in bank_rows],
+        erp_candidates,
+        threshold=0.80
+    )
+    
+    for bank_row, (partner_info, similarity) in zip(bank_rows, match_results):
         # 매칭 조건 확인: 거래처 매칭, 입출금 구분, 유효한 날짜
         if (partner_info and 
             bank_row["type"] in ("입금", "출금") and 
@@ -82,7 +110,8 @@ async def reconcile(erp: UploadFile = File(...), bank: UploadFile = File(...)):
     # Upload_form.xlsx 형식으로 엑셀 파일 생성
     try:
         template_path = "Upload_form.xlsx"
-        excel_buffer = build_upload_form_workbook(matches, unmatched, template_path)
+        # 큰 결과는 임시 파일에 기록되므로 이벤트 루프를 막지 않도록 스레드풀에서 생성
+        excel_file = await run_in_threadpool(build_upload_form_workbook, matches, unmatched, template_path)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -92,18 +121,25 @@ async def reconcile(erp: UploadFile = File(...), bank: UploadFile = File(...)):
             }
         )
     
+    # 파일 크기 확인 후 처음 위치로 이동
+    excel_size = excel_file.seek(0, io.SEEK_END)
+    excel_file.seek(0)
+    
     # 응답 헤더에 통계 정보 추가
     headers = {
         "Content-Disposition": "attachment; filename=upload_form.xlsx",
+        "Content-Length": str(excel_size),
         "X-Match-Count": str(len(matches)),
         "X-Unmatch-Count": str(len(unmatched)),
         "X-Total-Count": str(len(bank_rows))
     }
     
+    # 응답 본문을 끝까지 보내지 못한 경우(연결 끊김 등)에도 응답 후 임시 파일을 닫음
     return StreamingResponse(
-        excel_buffer,
+        _iter_file_chunks(excel_file),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers=headers
+        headers=headers,
+        background=BackgroundTask(excel_file.close)
     )
 
 